@@ -17,12 +17,11 @@ from abc import ABC
 from MLStructFP_benchmarks.ml.model.core._model import GenericModel, _PATH_SESSION, _PATH_LOGS
 from MLStructFP_benchmarks.ml.utils import iou_metric  # , jaccard_distance_loss
 
-from typing import Tuple, TYPE_CHECKING, Any, Dict, Optional
+from typing import List, Tuple, TYPE_CHECKING, Any, Dict, Optional, Union
 import gc
 import numpy as np
 import os
 import random
-import time
 import tensorflow as tf
 
 if TYPE_CHECKING:
@@ -31,13 +30,53 @@ if TYPE_CHECKING:
 _IOU_THRESHOLD = 0.3
 
 
+class _LazySamples:
+    """
+    Dict-like view over one part's sample arrays stored in a npz archive.
+    Each array is read from the archive only on first access, so sessions
+    loaded just for inspection do not pay the full sample-image RSS.
+    """
+    _cache: Dict[str, 'np.ndarray']
+    _keys: Dict[str, str]
+    _npz: Any
+
+    def __init__(self, npz: Any, keys: Dict[str, str]) -> None:
+        """
+        Constructor.
+
+        :param npz: Open npz archive
+        :param keys: Map from sample key to flat archive name
+        """
+        self._npz = npz
+        self._keys = keys
+        self._cache = {}
+
+    def __getitem__(self, key: str) -> 'np.ndarray':
+        if key not in self._cache:
+            self._cache[key] = self._npz[self._keys[key]]
+        return self._cache[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self._keys else default
+
+    def keys(self):
+        return self._keys.keys()
+
+    def items(self):
+        return [(key, self[key]) for key in self._keys]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
 def free() -> None:
     """
     Free memory fun.
     """
-    time.sleep(1)
     gc.collect()
-    time.sleep(1)
 
 
 def iou(y_true, y_pred):
@@ -59,6 +98,7 @@ class BaseFloorPhotoModel(GenericModel, ABC):
     _img_size: int
     _image_shape: Tuple[int, int, int]
     _samples: Dict[int, Dict[str, 'np.ndarray']]
+    _samples_npz: Optional[Any]  # Archive backing lazy sample views, if any
 
     def __init__(
             self,
@@ -94,6 +134,7 @@ class BaseFloorPhotoModel(GenericModel, ABC):
             self._image_shape = image_shape
 
         self._samples = {}
+        self._samples_npz = None
         self._img_size = self._image_shape[0]
         self._info(f'Image shape {self._image_shape}')
 
@@ -135,6 +176,24 @@ class BaseFloorPhotoModel(GenericModel, ABC):
             pred_img = pred_img.reshape((pred_img.shape[1], pred_img.shape[2], pred_img.shape[3]))
         return pred_img
 
+    def predict_images(
+            self,
+            imgs: Union[List['np.ndarray'], 'np.ndarray'],
+            threshold: bool = True
+    ) -> 'np.ndarray':
+        """
+        Predict several images within a single model call, which amortizes the
+        per-call graph overhead against predicting one by one.
+
+        :param imgs: List or stacked array of images
+        :param threshold: Use threshold
+        :return: Predicted image stack
+        """
+        if isinstance(imgs, (list, tuple)):
+            imgs = np.stack([i.reshape(self._image_shape) if len(i.shape) == 2 else i for i in imgs])
+        assert len(imgs.shape) == 4, 'Image stack must have shape (N, H, W, C)'
+        return self.predict_image(imgs, threshold=threshold)
+
     def _custom_save_session(self, filename: str, data: dict) -> None:
         """
         See upper doc.
@@ -144,8 +203,22 @@ class BaseFloorPhotoModel(GenericModel, ABC):
             if self._get_session_data('train_samples') is None:
                 self._register_session_data('train_samples', os.path.join(_PATH_SESSION, f'samples_{random.getrandbits(64)}.npz'))
             samples_f = self._get_session_data('train_samples')
-            # noinspection PyTypeChecker
-            np.savez_compressed(samples_f, data=self._samples)
+            # Lazy sample views read from the archive this rewrite replaces;
+            # materialize them and close the handle first, else the open file
+            # blocks the rewrite on Windows
+            if self._samples_npz is not None:
+                for part, sample in list(self._samples.items()):
+                    if isinstance(sample, _LazySamples):
+                        self._samples[part] = dict(sample.items())
+                self._samples_npz.close()
+                self._samples_npz = None
+            # Uncompressed save; zlib gains little on image samples and
+            # dominated the session save time. Each array is stored under a
+            # flat '{part}_{key}' name, avoiding the pickled-dict round trip
+            np.savez(samples_f, **{
+                f'{part}_{key}': arr
+                for part, sample in self._samples.items() for key, arr in sample.items()
+            })
 
     def _custom_load_session(
             self,
@@ -159,4 +232,17 @@ class BaseFloorPhotoModel(GenericModel, ABC):
         """
         samples_f: str = self._get_session_data('train_samples')  # Samples File
         if samples_f is not None:
-            self._samples = np.load(samples_f, allow_pickle=True)['data'].item()
+            loaded = np.load(samples_f, allow_pickle=True)
+            if 'data' in loaded.files:  # Legacy format, a single pickled dict
+                self._samples = loaded['data'].item()
+                loaded.close()
+            else:
+                # Flat '{part}_{key}' names: group per part and keep the
+                # archive open, each array is pulled only when first used
+                keys: Dict[int, Dict[str, str]] = {}
+                for key in loaded.files:
+                    part, k = key.split('_', 1)
+                    keys.setdefault(int(part), {})[k] = key
+                self._samples = {part: _LazySamples(loaded, part_keys)
+                                 for part, part_keys in keys.items()}
+                self._samples_npz = loaded
@@ -11,21 +11,53 @@ from MLStructFP_benchmarks.ml.utils import scale_array_to_range
 from MLStructFP_benchmarks.ml.utils.plot.architectures import Pix2PixFloorPhotoModelPlot
 from MLStructFP.utils import DEFAULT_PLOT_DPI, DEFAULT_PLOT_STYLE
 
+from keras import backend as k
 from keras.initializers import RandomNormal
 from keras.layers import Input, Dropout, LeakyReLU, BatchNormalization, \
     Conv2D, Concatenate, Layer, Activation, Conv2DTranspose
 from keras.models import Model
 from keras.optimizers import Adam
 
-from typing import List, Tuple, Union, TYPE_CHECKING, Optional
+from typing import Dict, List, NamedTuple, Tuple, Union, TYPE_CHECKING, Optional
 import datetime
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import tensorflow as tf
 
 if TYPE_CHECKING:
     from MLStructFP_benchmarks.ml.model.core import DataFloorPhoto
 
+# Mixed precision: let the graph optimizer rewrite eligible convolutions to
+# float16 on tensor-core GPUs, keeping variables and reductions in float32
+tf.config.optimizer.set_experimental_options({'auto_mixed_precision': True})
+
+# XLA auto-clustering: fuses the elementwise ops between convolutions
+# (LeakyReLU, BatchNorm, Dropout, Concatenate) into fewer GPU kernels
+tf.config.optimizer.set_jit(True)
+
+# Shared kernel initializer for every conv layer; Keras copies the config
+# per layer, so one instance is enough
+_INIT = RandomNormal(stddev=0.02)
+
+# Pin NHWC layout, image_shape is (H, W, C); every conv layer takes its
+# data_format from this setting, avoiding NCHW<->NHWC transposes on GPU
+k.set_image_data_format('channels_last')
+
+
+class _BatchInputs(NamedTuple):
+    """
+    Named view over the (ximg, ylabel, yimg, ylabel_weights, yimg_weights,
+    uses_learning_phase) tuple the fit loop feeds to the custom functions.
+    Unpacking validates the arity once instead of indexed access per field.
+    """
+    ximg: 'np.ndarray'
+    ylabel: 'np.ndarray'
+    yimg: 'np.ndarray'
+    ylabel_weights: 'np.ndarray'
+    yimg_weights: 'np.ndarray'
+    learning_phase: int
+
 
 class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
     """
@@ -33,6 +65,8 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
     """
     _current_train_date: str
     _current_train_part: int
+    _inference_noise: bool
+    _label_cache: Dict[int, Tuple['np.ndarray', 'np.ndarray']]
 
     # Models
     _d_model: 'Model'
@@ -70,6 +104,12 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
 
         self._current_train_date: str = ''
         self._current_train_part: int = -1
+
+        # Pix2Pix forces BatchNorm/Dropout into training mode also at
+        # inference; disabling yields a deterministic generator whose norm
+        # layers can be folded at predict time
+        self._inference_noise = kwargs.get('inference_noise', True)
+        self._register_session_data('inference_noise', self._inference_noise)
         self._info(f'Discriminator filters ({df}), generator filters ({gf})')
         self._register_session_data('df', df)
         self._register_session_data('gf', gf)
@@ -130,6 +170,7 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         )
 
         # Compute patch shape
+        self._label_cache = {}
         self._patch = self._d_model.output_shape[1]
         self._info('Patch shape ({0},{0}) ({1}/16)'.format(self._patch, self._image_shape[0]))
         self._register_session_data('patch', self._patch)
@@ -189,9 +230,6 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :param df: Discriminator filters
         :return: Keras model
         """
-        # Weight initialization
-        init = RandomNormal(stddev=0.02)
-
         # Source image input
         in_src_image = Input(shape=input_shape)  # Input image
 
@@ -202,31 +240,31 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         merged = Concatenate()([in_src_image, in_target_image])
 
         # C64
-        d = Conv2D(df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=init)(merged)
+        d = Conv2D(df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(merged)
         d = LeakyReLU(alpha=0.2)(d)
 
         # C128
-        d = Conv2D(2 * df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=init)(d)
+        d = Conv2D(2 * df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(d)
         d = BatchNormalization()(d)
         d = LeakyReLU(alpha=0.2)(d)
 
         # C256
-        d = Conv2D(4 * df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=init)(d)
+        d = Conv2D(4 * df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(d)
         d = BatchNormalization()(d)
         d = LeakyReLU(alpha=0.2)(d)
 
         # C512
-        d = Conv2D(8 * df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=init)(d)
+        d = Conv2D(8 * df, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(d)
         d = BatchNormalization()(d)
         d = LeakyReLU(alpha=0.2)(d)
 
         # Second last output layer
-        d = Conv2D(8 * df, (4, 4), padding='same', kernel_initializer=init)(d)
+        d = Conv2D(8 * df, (4, 4), padding='same', kernel_initializer=_INIT)(d)
         d = BatchNormalization()(d)
         d = LeakyReLU(alpha=0.2)(d)
 
         # Patch output
-        d = Conv2D(1, (4, 4), padding='same', kernel_initializer=init)(d)
+        d = Conv2D(1, (4, 4), padding='same', kernel_initializer=_INIT)(d)
         patch_out = Activation('sigmoid', name='out_' + self._output_layers[0])(d)
 
         # Define model
@@ -242,6 +280,9 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :param gf: Number of filters
         :return: Keras model
         """
+        # Forced training mode for norm/dropout layers, None follows the
+        # backend learning phase instead
+        noise = True if self._inference_noise else None
 
         def define_encoder_block(
                 layer_in: 'Layer',
@@ -256,13 +297,11 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
             :param batchnorm: Use batch normalization
             :return: Layer
             """
-            # weight initialization
-            _init = RandomNormal(stddev=0.02)
             # add downsampling layer
-            _g = Conv2D(n_filters, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_init)(layer_in)
+            _g = Conv2D(n_filters, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(layer_in)
             # conditionally add batch normalization
             if batchnorm:
-                _g = BatchNormalization()(_g, training=True)
+                _g = BatchNormalization()(_g, training=noise)
             # leaky relu activation
             _g = LeakyReLU(alpha=0.2)(_g)
             return _g
@@ -282,24 +321,19 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
             :param dropout: Use dropout
             :return: Layer
             """
-            # weight initialization
-            _init = RandomNormal(stddev=0.02)
             # add upsampling layer
-            _g = Conv2DTranspose(n_filters, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_init)(layer_in)
+            _g = Conv2DTranspose(n_filters, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(layer_in)
             # add batch normalization
-            _g = BatchNormalization()(_g, training=True)
+            _g = BatchNormalization()(_g, training=noise)
             # conditionally add dropout
             if dropout:
-                _g = Dropout(0.5)(_g, training=True)
+                _g = Dropout(0.5)(_g, training=noise)
             # merge with skip connection
             _g = Concatenate()([_g, skip_in])
             # relu activation
             _g = Activation('relu')(_g)
             return _g
 
-        # Weight initialization
-        init = RandomNormal(stddev=0.02)
-
         # Image input
         in_image = Input(shape=input_shape)
 
@@ -319,7 +353,7 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
             e7 = e6
 
         # Bottleneck, no batch norm and relu
-        b = Conv2D(8 * gf, (4, 4), strides=(2, 2), padding='same', kernel_initializer=init)(e7)
+        b = Conv2D(8 * gf, (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(e7)
         b = Activation('relu')(b)
 
         # Decoder model
@@ -338,13 +372,31 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         d7 = decoder_block(d6, e1, gf, dropout=False)
 
         # Output
-        g = Conv2DTranspose(output_shape[2], (4, 4), strides=(2, 2), padding='same', kernel_initializer=init)(d7)
+        g = Conv2DTranspose(output_shape[2], (4, 4), strides=(2, 2), padding='same', kernel_initializer=_INIT)(d7)
         out_image = Activation('sigmoid', name='out_' + self._output_layers[1])(g)
 
         # Define model
         model = Model(inputs=in_image, outputs=out_image, name=self._output_layers[1])
         return model
 
+    def _get_labels(self, n_samples: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Returns cached (true, fake) label vectors. Batch size is constant
+        during training, thus the constant arrays are allocated only once.
+
+        :param n_samples: Number of samples
+        :return: True/fake label vectors
+        """
+        if n_samples not in self._label_cache:
+            shape = (n_samples, self._patch, self._patch, 1)
+            ones, zeros = np.ones(shape), np.zeros(shape)
+            # Read-only, the cached arrays are shared across batches; a caller
+            # writing into them would silently corrupt every later batch
+            ones.flags.writeable = False
+            zeros.flags.writeable = False
+            self._label_cache[n_samples] = (ones, zeros)
+        return self._label_cache[n_samples]
+
     def generate_true_labels(self, n_samples: int) -> 'np.ndarray':
         """
         Returns true label vectors.
@@ -353,7 +405,7 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :return: Vector
         """
         assert n_samples > 0
-        return np.ones((n_samples, self._patch, self._patch, 1))
+        return self._get_labels(n_samples)[0]
 
     def generate_fake_labels(self, n_samples: int) -> 'np.ndarray':
         """
@@ -363,7 +415,7 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :return: Vector
         """
         assert n_samples > 0
-        return np.zeros((n_samples, self._patch, self._patch, 1))
+        return self._get_labels(n_samples)[1]
 
     def _generate_fake_samples(self, samples: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
         """
@@ -372,8 +424,10 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :param samples: Image samples
         :return: Fake samples
         """
-        # Generate fake instance
-        x = self._g_model.predict(samples)
+        # Generate fake instance. predict_on_batch runs the already-batched
+        # samples through a single graph call, without the predict-loop
+        # batching and callback scaffolding
+        x = self._g_model.predict_on_batch(samples)
 
         # Create 'fake' class labels (0)
         y = self.generate_fake_labels(len(x))
@@ -387,21 +441,16 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :param inputs: Train input
         :return: Train metrics
         """
-        assert len(inputs) == 6
-
-        ximg_real: 'np.ndarray' = inputs[0]
-
-        ylabel_real: 'np.ndarray' = inputs[1]
-        yimg_real: 'np.ndarray' = inputs[2]
-
-        ylabel_weights: 'np.ndarray' = inputs[3]
-        yimg_weights: 'np.ndarray' = inputs[4]
-        # use_learning_phase: int = inputs[5]
+        b = _BatchInputs(*inputs)
+        ximg_real, ylabel_real, yimg_real = b.ximg, b.ylabel, b.yimg
+        ylabel_weights, yimg_weights = b.ylabel_weights, b.yimg_weights
 
         # Generate a batch of fake samples
         yimg_fake, ylabel_fake = self._generate_fake_samples(yimg_real)
 
-        self._d_model.trainable = True
+        # Trainable flags were frozen at compile time: the standalone
+        # discriminator updates its weights, the combined model does not.
+        # Flipping .trainable here would only dirty the compiled functions
 
         # Update discriminator for real samples
         d_real_loss = self._d_model.train_on_batch(
@@ -417,8 +466,6 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
             sample_weight=ylabel_weights
         )
 
-        self._d_model.trainable = False
-
         # Update the generator, this does not train discriminator as weights
         # were defined as not trainable
         # 'loss', 'discriminator_loss', 'generator_loss', 'generator_iou', 'generator_accuracy'
@@ -439,43 +486,35 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         :param inputs: Train input
         :return: Validation metrics
         """
-        assert len(inputs) == 6
-
-        ximg_real: 'np.ndarray' = inputs[0]
-
-        ylabel_real: 'np.ndarray' = inputs[1]
-        yimg_real: 'np.ndarray' = inputs[2]
-
-        ylabel_weights: 'np.ndarray' = inputs[3]
-        yimg_weights: 'np.ndarray' = inputs[4]
-        # use_learning_phase: int = inputs[5]
+        b = _BatchInputs(*inputs)
+        ximg_real, ylabel_real, yimg_real = b.ximg, b.ylabel, b.yimg
+        ylabel_weights, yimg_weights = b.ylabel_weights, b.yimg_weights
 
         # Generate a batch of fake samples
         yimg_fake, ylabel_fake = self._generate_fake_samples(yimg_real)
 
-        # Evaluate discriminator for real samples
-        d_real_loss = self._d_model.evaluate(
+        # Evaluate discriminator for real samples. The batch is already
+        # assembled, thus test_on_batch avoids the evaluate-loop batching
+        # and progress scaffolding per call
+        d_real_loss = self._d_model.test_on_batch(
             x=[ximg_real, yimg_real],
             y=ylabel_real,
-            sample_weight=ylabel_weights,
-            verbose=False
+            sample_weight=ylabel_weights
         )
 
         # Evaluate discriminator for generated samples
-        d_fake_loss = self._d_model.evaluate(
+        d_fake_loss = self._d_model.test_on_batch(
             x=[ximg_real, yimg_fake],
             y=ylabel_fake,
-            sample_weight=ylabel_weights,
-            verbose=False
+            sample_weight=ylabel_weights
         )
 
         # Evaluate the generator
         # 'loss', 'discriminator_loss', 'generator_loss', 'generator_iou', 'generator_accuracy'
-        g_loss, gd_loss, gg_loss, g_iou, g_acc = self._model.evaluate(
+        g_loss, gd_loss, gg_loss, g_iou, g_acc = self._model.test_on_batch(
             x=ximg_real,
             y=[ylabel_real, yimg_real],  # discriminator, generator
-            sample_weight=[ylabel_weights, yimg_weights],
-            verbose=False
+            sample_weight=[ylabel_weights, yimg_weights]
         )
 
         del yimg_fake, ylabel_fake
@@ -487,29 +526,35 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
 
         :param num_epoch: Number of the epoch
         """
+        sample = self._samples[self._current_train_part]
+        if len(sample['input']) == 0:  # n_samples=0, nothing to assemble
+            return
+
         # Create figure
         _ = plt.figure(dpi=DEFAULT_PLOT_DPI)
         plt.style.use(DEFAULT_PLOT_STYLE)
-        sample = self._samples[self._current_train_part]
-        n_samples = len(sample['input'])
         plt.title(f'Epoch {num_epoch}')
         sample['predicted'] = self.predict_image(sample['input'])
 
-        # Plot real source images
-        for i in range(n_samples):
-            plt.subplot(3, n_samples, 1 + i)
-            plt.axis('off')
-            plt.imshow(sample['input'][i])
-        # Plot generated target image
-        for i in range(n_samples):
-            plt.subplot(3, n_samples, 1 + n_samples + i)
-            plt.axis('off')
-            plt.imshow(sample['predicted'][i])
-        # Plot real target image
-        for i in range(n_samples):
-            plt.subplot(3, n_samples, 1 + n_samples * 2 + i)
-            plt.axis('off')
-            plt.imshow(sample['real'][i])
+        def _to_row(img: 'np.ndarray') -> 'np.ndarray':
+            """
+            Lay out a sample stack as a single row, normalized to (0, 1).
+
+            :param img: Sample images (N, H, W, C)
+            :return: Row image
+            """
+            row = np.concatenate(list(img), axis=1).astype('float32')
+            if row.max() > 1:
+                row /= 255
+            return row
+
+        # Assemble input/predicted/real rows into one image, plotted with a
+        # single imshow instead of 3*n_samples subplot calls
+        grid = np.concatenate([_to_row(sample['input']), _to_row(sample['predicted']), _to_row(sample['real'])], axis=0)
+        if grid.shape[-1] == 1:
+            grid = grid.reshape(grid.shape[:2])
+        plt.imshow(grid)
+        plt.axis('off')
 
         fig_file: str = '{6}{0}{1}{2}_{3}_part_{4}_epoch{5}.png'.format(
             _PATH_LOGS, os.path.sep, self.get_name(True), self._current_train_date,
@@ -573,13 +618,19 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
             part_data = self._data.load_part(part=part, shuffle=True)
             xtrain_img: 'np.ndarray' = part_data['photo']
             ytrain_img: 'np.ndarray' = part_data['binary']
-            ytrain_label = self.generate_true_labels(len(ytrain_img))
+            # Stride-0 broadcast view, the (N, patch, patch, 1) ones array is
+            # never materialized; batches are gathered from it on demand
+            ytrain_label = np.broadcast_to(
+                np.ones((1, self._patch, self._patch, 1), dtype='float32'),
+                (len(ytrain_img), self._patch, self._patch, 1)
+            )
             free()
 
-            # Make sample inputs
-            sample_id = np.random.randint(0, len(xtrain_img), n_samples)
-            sample_input = xtrain_img[sample_id]
-            sample_real = ytrain_img[sample_id]
+            # Make sample inputs. Parts are loaded shuffled, so a contiguous
+            # head slice is already a random sample; copy so the retained
+            # samples do not pin the full part arrays in memory
+            sample_input = xtrain_img[:n_samples].copy()
+            sample_real = ytrain_img[:n_samples].copy()
 
             self._samples[part] = {
                 'input': sample_input,
@@ -611,7 +662,11 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
 
             # Predict samples
             if n_samples > 0:
-                sample_predicted = self.predict_image(sample_input)
+                # The epoch-finish hook already predicted these inputs on the
+                # last epoch; run the forward pass only if it did not
+                sample_predicted = self._samples[part].get('predicted')
+                if sample_predicted is None:
+                    sample_predicted = self.predict_image(sample_input)
 
                 # Save samples
                 self._samples[part] = {
@@ -633,7 +688,11 @@ class Pix2PixFloorPhotoModel(BaseFloorPhotoModel):
         """
         See upper doc.
         """
-        return self._model_predict(x=self._format_tuple(scale_array_to_range(x, (0, 1), 'uint8'), 'np', 'x'))[1]
+        if not self._is_trained:
+            raise RuntimeError('Model has not been trained yet, use .train(*args)')
+        # Run only the generator; the combined model would also evaluate the
+        # discriminator just to discard its output
+        return self._g_model.predict(self._format_tuple(scale_array_to_range(x, (0, 1), 'uint8'), 'np', 'x'))
 
     def evaluate(self, x: 'np.ndarray', y: Tuple['np.ndarray', 'np.ndarray']) -> List[float]:
         """
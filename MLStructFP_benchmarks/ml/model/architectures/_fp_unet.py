@@ -10,17 +10,36 @@ from MLStructFP_benchmarks.ml.model.architectures._fp_base import *
 from MLStructFP_benchmarks.ml.utils import scale_array_to_range
 from MLStructFP_benchmarks.ml.utils.plot.architectures import UNETFloorPhotoModelPlot
 
-from keras.layers import Input, Dropout, concatenate, Conv2D, UpSampling2D, MaxPooling2D
+from keras import backend as k
+from keras.layers import Input, Dropout, concatenate, Add, Conv2D, Conv2DTranspose, MaxPooling2D
 from keras.models import Model
 from keras.optimizers import Adam
 
 from typing import List, Tuple, TYPE_CHECKING, Optional
 import datetime
 import numpy as np
+import tensorflow as tf
 
 if TYPE_CHECKING:
     from MLStructFP_benchmarks.ml.model.core import DataFloorPhoto
 
+# Graph optimizer options: mixed precision rewrites eligible conv ops to half
+# precision on tensor-core GPUs (variables and the loss stay in float32), the
+# layout/folding passes keep conv inputs in the cuDNN-preferred layout
+tf.config.optimizer.set_experimental_options({
+    'auto_mixed_precision': True,
+    'constant_folding': True,
+    'layout_optimizer': True
+})
+
+# XLA auto-clustering: the UNet is a static-shape graph, so the relu/bias and
+# concatenate ops between convolutions fuse into fewer GPU kernels
+tf.config.optimizer.set_jit(True)
+
+# Pin the data format the data pipeline produces (N, H, W, C), independent of
+# whatever the local keras config file says; every layer reads this setting
+k.set_image_data_format('channels_last')
+
 
 class UNETFloorPhotoModel(BaseFloorPhotoModel):
     """
@@ -28,6 +47,7 @@ class UNETFloorPhotoModel(BaseFloorPhotoModel):
     """
     _current_train_date: str
     _current_train_part: int
+    _rng: 'np.random.Generator'
 
     plot: 'UNETFloorPhotoModelPlot'
 
@@ -45,66 +65,72 @@ class UNETFloorPhotoModel(BaseFloorPhotoModel):
         :param name: Model name
         :param image_shape: Input shape
         :param kwargs: Optional keyword arguments
+
+        Optional parameters:
+            - use_residual_skip     Merge skip connections by addition instead of concatenation
         """
 
         # Create the base model
         BaseFloorPhotoModel.__init__(self, data, name, image_shape, **kwargs)
         self._output_layers = ['out']
 
+        # Additive skips halve the decoder conv input channels (and their
+        # weights/FLOPs) compared to concatenation, at some accuracy cost
+        use_residual_skip: bool = kwargs.get('use_residual_skip', False)
+        assert isinstance(use_residual_skip, bool)
+
         # Register constructor
         self._register_session_data('image_shape', self._image_shape)
+        self._register_session_data('use_residual_skip', use_residual_skip)
+
+        def _conv_block(layer, ch: int, dropout: bool = False):
+            """
+            Two stacked 3x3 convolutions, with optional dropout.
+
+            :param layer: Input layer
+            :param ch: Number of filters
+            :param dropout: Apply dropout after the convolutions
+            :return: Layer
+            """
+            layer = Conv2D(ch, 3, activation='relu', padding='same', kernel_initializer='he_normal')(layer)
+            layer = Conv2D(ch, 3, activation='relu', padding='same', kernel_initializer='he_normal')(layer)
+            if dropout:
+                layer = Dropout(0.5)(layer)
+            return layer
+
+        # Encoder channels per level, the bottleneck doubles the deepest one;
+        # the deepest level and the bottleneck apply dropout
+        channels = [64, 128, 256, 512]
 
         inputs = Input(self._image_shape)
-        conv1 = Conv2D(64, 3, activation='relu', padding='same', kernel_initializer='he_normal')(inputs)
-        conv1 = Conv2D(64, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv1)
-        pool1 = MaxPooling2D(pool_size=(2, 2))(conv1)
-        conv2 = Conv2D(128, 3, activation='relu', padding='same', kernel_initializer='he_normal')(pool1)
-        conv2 = Conv2D(128, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv2)
-        pool2 = MaxPooling2D(pool_size=(2, 2))(conv2)
-        conv3 = Conv2D(256, 3, activation='relu', padding='same', kernel_initializer='he_normal')(pool2)
-        conv3 = Conv2D(256, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv3)
-        pool3 = MaxPooling2D(pool_size=(2, 2))(conv3)
-        conv4 = Conv2D(512, 3, activation='relu', padding='same', kernel_initializer='he_normal')(pool3)
-        conv4 = Conv2D(512, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv4)
-        drop4 = Dropout(0.5)(conv4)
-        pool4 = MaxPooling2D(pool_size=(2, 2))(drop4)
-
-        conv5 = Conv2D(1024, 3, activation='relu', padding='same', kernel_initializer='he_normal')(pool4)
-        conv5 = Conv2D(1024, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv5)
-        drop5 = Dropout(0.5)(conv5)
-
-        up6 = Conv2D(512, 2, activation='relu', padding='same', kernel_initializer='he_normal')(
-            UpSampling2D(size=(2, 2))(drop5))
-        merge6 = concatenate([drop4, up6], axis=3)
-        conv6 = Conv2D(512, 3, activation='relu', padding='same', kernel_initializer='he_normal')(merge6)
-        conv6 = Conv2D(512, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv6)
-
-        up7 = Conv2D(256, 2, activation='relu', padding='same', kernel_initializer='he_normal')(
-            UpSampling2D(size=(2, 2))(conv6))
-        merge7 = concatenate([conv3, up7], axis=3)
-        conv7 = Conv2D(256, 3, activation='relu', padding='same', kernel_initializer='he_normal')(merge7)
-        conv7 = Conv2D(256, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv7)
-
-        up8 = Conv2D(128, 2, activation='relu', padding='same', kernel_initializer='he_normal')(
-            UpSampling2D(size=(2, 2))(conv7))
-        merge8 = concatenate([conv2, up8], axis=3)
-        conv8 = Conv2D(128, 3, activation='relu', padding='same', kernel_initializer='he_normal')(merge8)
-        conv8 = Conv2D(128, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv8)
-
-        up9 = Conv2D(64, 2, activation='relu', padding='same', kernel_initializer='he_normal')(
-            UpSampling2D(size=(2, 2))(conv8))
-        merge9 = concatenate([conv1, up9], axis=3)
-        conv9 = Conv2D(64, 3, activation='relu', padding='same', kernel_initializer='he_normal')(merge9)
-        conv9 = Conv2D(64, 3, activation='relu', padding='same', kernel_initializer='he_normal')(conv9)
-        conv10 = Conv2D(1, 1, activation='sigmoid', name=self._output_layers[0])(conv9)  # To binary, aka, just b/w
-
-        self._model = Model(inputs=inputs, outputs=conv10)
+        x = inputs
+        skips = []
+        for ch in channels:
+            x = _conv_block(x, ch, dropout=ch == channels[-1])
+            skips.append(x)
+            x = MaxPooling2D(pool_size=(2, 2))(x)
+
+        # Bottleneck
+        x = _conv_block(x, 2 * channels[-1], dropout=True)
+
+        # Decoder, mirrors the encoder consuming the skip connections; the
+        # channel counts match level by level, so the additive merge is valid
+        for ch, skip in zip(reversed(channels), reversed(skips)):
+            up = Conv2DTranspose(ch, 2, strides=(2, 2), activation='relu', padding='same',
+                                 kernel_initializer='he_normal')(x)
+            merge = Add()([skip, up]) if use_residual_skip else concatenate([skip, up], axis=3)
+            x = _conv_block(merge, ch)
+
+        out = Conv2D(1, 1, activation='sigmoid', name=self._output_layers[0])(x)  # To binary, aka, just b/w
+
+        self._model = Model(inputs=inputs, outputs=out)
         self.compile(
             optimizer=Adam(lr=1e-4),
             loss='binary_crossentropy',  # jaccard_distance_loss(),
             metrics=[iou, 'accuracy']
         )
         self._check_compilation = False
+        self._rng = np.random.default_rng()
 
         self.plot = UNETFloorPhotoModelPlot(self)
 
@@ -162,14 +188,19 @@ class UNETFloorPhotoModel(BaseFloorPhotoModel):
 
             print(f'Loading data part {part}/{total_parts}')
             part_data = self._data.load_part(part=part, shuffle=True)
-            xtrain_img: 'np.ndarray' = part_data['photo']
-            ytrain_img: 'np.ndarray' = part_data['binary']
-
-            # Crop data
-            free()
-
-            # Make sample inputs
-            sample_id = np.random.randint(0, len(xtrain_img), n_samples)
+            if part < total_parts:  # Overlap the next part load with this train
+                self._data.prefetch_part(part + 1, shuffle=True)
+
+            # Normalize to (0, 1) in a single fused pass (uint8 parts go
+            # through the lookup-table fast path), matching the predict input
+            # range; the uint8 source buffers are released right away
+            xtrain_img: 'np.ndarray' = scale_array_to_range(part_data['photo'], (0, 1), 'float32')
+            ytrain_img: 'np.ndarray' = scale_array_to_range(part_data['binary'], (0, 1), 'float32')
+            del part_data  # Refcounting frees the uint8 buffers right here
+
+            # Make sample inputs, drawn without replacement so no sample is
+            # predicted and plotted twice
+            sample_id = self._rng.choice(len(xtrain_img), size=min(n_samples, len(xtrain_img)), replace=False)
             sample_input = xtrain_img[sample_id]
             sample_real = ytrain_img[sample_id]
 
@@ -195,7 +226,6 @@ class UNETFloorPhotoModel(BaseFloorPhotoModel):
             )
 
             free()
-            del part_data
             if not self._is_trained:
                 print('Train failed, stopping')
                 self._print_enabled = print_enabled
@@ -225,7 +255,10 @@ class UNETFloorPhotoModel(BaseFloorPhotoModel):
         """
         See upper doc.
         """
-        return self._model_predict(x=self._format_tuple(scale_array_to_range(x, (0, 1), 'uint8'), 'np', 'x'))
+        # Scale in float32; the former uint8 cast rounded the (0, 1) input to
+        # {0, 1}, discarding the photo grayscale detail on every prediction.
+        # Inputs already within range pass through without a copy
+        return self._model_predict(x=self._format_tuple(scale_array_to_range(x, (0, 1), 'float32'), 'np', 'x'))
 
     def evaluate(self, x: 'np.ndarray', y: Tuple['np.ndarray', 'np.ndarray']) -> List[float]:
         """
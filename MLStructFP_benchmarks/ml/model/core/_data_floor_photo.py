@@ -12,51 +12,36 @@ __all__ = [
 
 from MLStructFP.utils import DEFAULT_PLOT_DPI, configure_figure, make_dirs
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Tuple, Any, Optional
-import gc
 import json
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 import random
-import time
+import re
 import zipfile
 
 _DATA_DTYPE: str = 'uint8'
+_PART_FILE_RE = re.compile(r'^(\d+)_\w+\.npz$')  # Part files named ID_type.npz
 _SESSION_EXPORT_VERSION: str = '1.0'
 
 
 def _is_dict_equal(x: Dict[Any, Any], y: Dict[Any, Any]) -> bool:
     """
-    Returns true if both dicts are equal.
+    Returns true if both dicts are equal. Keys are compared as strings and
+    tuple values as lists, to tolerate the JSON session round-trip.
 
     :param x: Dict
     :param y: Dict
     :return: True if equal
     """
-    kx = list(x.keys())
-    ky = list(y.keys())
-    if len(kx) != len(ky):
-        return False
-    for i in range(len(kx)):
-        if str(kx[i]) != str(ky[i]):  # Assert keys
-            return False
-        xki: Any = x[kx[i]]
-        yki: Any = y[ky[i]]
-        if isinstance(xki, (list, tuple)):
-            assert isinstance(yki, (list, tuple))
-            if len(xki) != len(yki):
-                return False
-            for j in range(len(xki)):
-                if xki[j] != yki[j]:
-                    return False
-        else:
-            if type(xki) != type(yki):
-                return False
-            if xki != yki:
-                return False
-    return True
+
+    def _norm(d: Dict[Any, Any]) -> Dict[str, Any]:
+        return {str(k): list(v) if isinstance(v, tuple) else v for k, v in d.items()}
+
+    return _norm(x) == _norm(y)
 
 
 # noinspection PyUnresolvedReferences
@@ -77,6 +62,54 @@ def _npz_headers(npz: str):
             yield name[:-4], shape, dtype
 
 
+def _npz_load(npz: str, name: str = 'data', out: Optional['np.ndarray'] = None) -> 'np.ndarray':
+    """
+    Load a single array from a .npz file. For uncompressed archives, seeks
+    directly to the inner .npy payload and reads it with np.lib.format,
+    which avoids re-parsing the zip through the slow ZipExtFile reader.
+    Falls back to np.load on compressed archives.
+
+    :param npz: Path to the .npz file
+    :param name: Array name within the archive
+    :param out: If given, read the data into this array (shape/dtype must match)
+    :return: Loaded array
+    """
+
+    def _fill(data: 'np.ndarray') -> 'np.ndarray':
+        if out is None:
+            return data
+        out[:] = data
+        return out
+
+    with zipfile.ZipFile(npz) as archive:
+        info = archive.NameToInfo.get(name + '.npy')
+        if info is None or info.compress_type != zipfile.ZIP_STORED:
+            return _fill(np.load(npz)[name])
+        fp = archive.fp
+        fp.seek(info.header_offset)
+        header = fp.read(30)  # Local file header, sized by its name/extra fields
+        if header[:4] != b'PK\x03\x04':
+            return _fill(np.load(npz)[name])
+        name_len = int.from_bytes(header[26:28], 'little')
+        extra_len = int.from_bytes(header[28:30], 'little')
+        payload = info.header_offset + 30 + name_len + extra_len
+        fp.seek(payload)
+        if out is not None:
+            version = np.lib.format.read_magic(fp)
+            # noinspection PyProtectedMember
+            shape, fortran, dtype = np.lib.format._read_array_header(fp, version)
+            if not fortran and shape == out.shape and dtype == out.dtype and out.flags['C_CONTIGUOUS']:
+                mv = memoryview(out).cast('B')  # Read the payload straight into the destination
+                n = 0
+                while n < len(mv):
+                    r = fp.readinto(mv[n:])
+                    assert r, f'Truncated npy payload in <{npz}>'
+                    n += r
+                return out
+            fp.seek(payload)
+        return _fill(np.lib.format.read_array(fp, allow_pickle=False))
+
+
 class DataFloorPhoto(object):
     """
     Floor Photo data, which stores binary/photo from a given path. The path must contain images with the format:
@@ -90,8 +123,10 @@ class DataFloorPhoto(object):
     _floor_photo_ch: int  # Number of photo channels
     _floor_photo_size: int  # Size of photo image
     _loaded_session: Dict[str, Any]  # Stores session data
+    _part_headers: Dict[int, Tuple[Tuple[int, ...], Any]]  # Cached (shape, dtype) binary header per part
     _parts: List[int]  # List of part IDs
     _path: str  # Path containg the images
+    _prefetch: Optional[Tuple[Tuple[int, bool, bool], 'Future']]  # Pending background part load
     _split: Optional[List[List[int]]]  # Train/test split
 
     def __init__(self, path: str, shuffle_parts: bool = True) -> None:
@@ -104,25 +139,28 @@ class DataFloorPhoto(object):
         assert os.path.isdir(path), f'Path <{path}> does not exist'
         self._path = path
         self._parts = []
+        self._part_headers = {}
         self._loaded_session = {}
+        self._prefetch = None
         self._split = []
+        part_ids = set()  # IDs found so far, for O(1) membership
         for f in os.listdir(path):
-            j = f.split('_')
-            if os.path.splitext(f)[1] != '.npz':
+            if not f.endswith('.npz'):
                 continue
-            assert len(j) == 2, f'File require name format ID_type.npz, but <{f}> was found in path'
-            assert j[0].isnumeric(), f'File ID must be numeric, however <{j[0]}> was provided'
-            f_id = int(j[0])
-            if f_id in self._parts:
+            m = _PART_FILE_RE.match(f)
+            assert m is not None, f'File require name format ID_type.npz, but <{f}> was found in path'
+            f_id = int(m.group(1))
+            if f_id in part_ids:
                 continue
+            part_ids.add(f_id)
             for img in self._get_file(f_id):
                 assert os.path.isfile(img), f'File <{img}> was expected in path, but not found'
             self._parts.append(f_id)
 
-        # Retrieve shape
+        # Retrieve shape from the npz header, without loading the image data
         assert len(self._parts) > 0, 'No valid files were found at given path'
         self._parts.sort()
-        s: Tuple[int, ...] = np.load(self._get_file(self._parts[0])[0])['data'][0].shape
+        s: Tuple[int, ...] = next(_npz_headers(self._get_file(self._parts[0])[0]))[1][1:]
         self._floor_photo_size = s[0]
         self._floor_photo_ch = 1 if len(s) == 2 else s[2]
 
@@ -141,6 +179,24 @@ class DataFloorPhoto(object):
         """
         return os.path.join(self._path, f'{part_id}_binary.npz'), os.path.join(self._path, f'{part_id}_photo.npz')
 
+    def _get_part_header(self, part_id: int) -> Tuple[Tuple[int, ...], Any]:
+        """
+        Return the (shape, dtype) of a given part binary file, reading the
+        npz header only once per part.
+
+        :param part_id: Part ID
+        :return: Shape/dtype tuple
+        """
+        if part_id not in self._part_headers:
+            i_info = next(_npz_headers(self._get_file(part_id)[0]))  # ('data', (N, SIZE, SIZE), dtype('DTYPE'))
+            i_shp, i_dtype = i_info[1], i_info[2]
+            assert i_shp[1] == i_shp[2] == self._floor_photo_size, \
+                'Each image part must have size ({0}, {0})'.format(self._floor_photo_size)
+            assert i_dtype == _DATA_DTYPE, \
+                f'Data type does not match, requires {_DATA_DTYPE}, but {i_dtype} was provided when loading parts'
+            self._part_headers[part_id] = (i_shp, i_dtype)
+        return self._part_headers[part_id]
+
     def get_image_shape(self) -> Tuple[int, int, int]:
         """
         Get image shape. As rect image channels are converted to target floor photo channels,
@@ -164,10 +220,25 @@ class DataFloorPhoto(object):
         """
         total = 0
         for i in self._parts:  # Iterate each part
-            i_info = list(_npz_headers(self._get_file(i)[0]))[0]  # ('data', (N, SIZE, SIZE), dtype('DTYPE'))
-            total += i_info[1][0]
+            total += self._get_part_header(i)[0][0]
         return total
 
+    def prefetch_part(self, part: int, shuffle: bool = False, ignore_split: bool = False) -> None:
+        """
+        Load a part in a background thread. The next load_part call with the
+        same arguments returns the prefetched data instead of reading the disk.
+
+        :param part: Num part. If split, one returns train, else, return test
+        :param shuffle: Shuffle data order
+        :param ignore_split: If true, ignores train/test split
+        """
+        key = (part, shuffle, ignore_split)
+        if self._prefetch is not None and self._prefetch[0] == key:
+            return
+        executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetch = (key, executor.submit(self._load_part, part, shuffle, ignore_split))
+        executor.shutdown(wait=False)
+
     def load_part(self, part: int, shuffle: bool = False, ignore_split: bool = False) -> Dict[str, 'np.ndarray']:
         """
         Load part and save into memory.
@@ -175,27 +246,38 @@ class DataFloorPhoto(object):
         :param part: Num part. If split, one returns train, else, return test
         :param shuffle: Shuffle data order
         :param ignore_split: If true, ignores train/test split
-        :return: Binary/Photo data. Images are within (0, 1) range
+        :return: Binary/Photo data. Images are uint8 within (0, 255) range
+        """
+        if self._prefetch is not None:
+            p_key, p_future = self._prefetch
+            self._prefetch = None
+            if p_key == (part, shuffle, ignore_split):
+                return p_future.result()
+        return self._load_part(part, shuffle, ignore_split)
+
+    def _load_part(self, part: int, shuffle: bool, ignore_split: bool) -> Dict[str, 'np.ndarray']:
+        """
+        Load part from disk. See load_part.
+
+        :param part: Num part
+        :param shuffle: Shuffle data order
+        :param ignore_split: If true, ignores train/test split
+        :return: Binary/Photo data
         """
         img_b: 'np.ndarray'
         img_p: 'np.ndarray'
         if len(self._split) == 0 or ignore_split:
             assert 1 <= part <= len(self._parts), f'Number of parts overflow, min:1, max:{len(self._parts)}'
             f = self._get_file(self._parts[part - 1])
-            img_b = np.load(f[0])['data']  # Binary
-            img_p = np.load(f[1])['data']  # Photo
+            img_b = _npz_load(f[0])  # Binary
+            img_p = _npz_load(f[1])  # Photo
         else:
             assert part in (1, 2), '1 returns train, 2 test. No other part value allowed'
             # First, get all images size and create a numpy zero object
             imgs = 0  # Total images loaded so far
             sizes: Dict[int, int] = {}  # Size for each part
             for i in self._split[part - 1]:  # Iterate loaded parts
-                i_info = list(_npz_headers(self._get_file(i)[0]))[0]  # ('data', (N, SIZE, SIZE), dtype('DTYPE'))
-                i_shp = i_info[1]
-                assert i_shp[1] == i_shp[2] == self._floor_photo_size, \
-                    'Each image part must have size ({0}, {0})'.format(self._floor_photo_size)
-                assert i_info[2] == _DATA_DTYPE, \
-                    f'Data type does not match, requires {_DATA_DTYPE}, but {i_info[2]} was provided when loading parts'
+                i_shp = self._get_part_header(i)[0]  # Header is validated on first access
                 imgs += i_shp[0]
                 sizes[i] = i_shp[0]
 
@@ -203,25 +285,36 @@ class DataFloorPhoto(object):
             new_shape = (imgs, self._floor_photo_size, self._floor_photo_size)
             if self._floor_photo_ch != 1:
                 new_shape = (*new_shape, self._floor_photo_size)
-            img_b = np.zeros(new_shape, dtype=_DATA_DTYPE)
-            img_p = np.zeros(new_shape, dtype=_DATA_DTYPE)
+            # Every element is overwritten below, so skip the zero-fill pass
+            img_b = np.empty(new_shape, dtype=_DATA_DTYPE)
+            img_p = np.empty(new_shape, dtype=_DATA_DTYPE)
 
+            # Compute the target offset of each part within the stacked arrays
+            offsets: Dict[int, int] = {}
             j = 0  # Index to add
-            k = 0  # Number of processed parts
-            for i in self._split[part - 1]:  # Iterate loaded parts
-                f = self._get_file(i)
-                img_b[j:j + sizes[i]] = np.load(f[0])['data']  # Binary
-                img_p[j:j + sizes[i]] = np.load(f[1])['data']  # Photo
+            for i in self._split[part - 1]:
+                offsets[i] = j
                 j += sizes[i]
-                k += 1
-                if k % 50 == 0:
-                    gc.collect()
 
-        # Convert type
-        if img_b.dtype != _DATA_DTYPE:
-            img_b = np.array(img_b, dtype=_DATA_DTYPE)
-        if img_p.dtype != _DATA_DTYPE:
-            img_p = np.array(img_p, dtype=_DATA_DTYPE)
+            def _load_part_into(i: int) -> None:
+                """
+                Load a single part into its preallocated slice.
+
+                :param i: Part ID
+                """
+                f_i = self._get_file(i)
+                o = offsets[i]
+                _npz_load(f_i[0], out=img_b[o:o + sizes[i]])  # Binary
+                _npz_load(f_i[1], out=img_p[o:o + sizes[i]])  # Photo
+
+            # Slices are disjoint, thus parts can be read concurrently
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for _ in executor.map(_load_part_into, self._split[part - 1]):
+                    pass
+
+        # Convert type, as a single vectorized cast which avoids the copy if dtype already matches
+        img_b = img_b.astype(_DATA_DTYPE, copy=False)
+        img_p = img_p.astype(_DATA_DTYPE, copy=False)
 
         # Check length is the same
         s_b = img_b.shape
@@ -237,18 +330,17 @@ class DataFloorPhoto(object):
 
         # Shuffle
         if shuffle:
-            indices = np.arange(img_b.shape[0])
+            # int32 indices suffice, part sizes are far below 2^31 images
+            indices = np.arange(img_b.shape[0], dtype='int32')
             np.random.shuffle(indices)
-            img_b = img_b[indices]
-            img_p = img_p[indices]
+            img_b = np.take(img_b, indices, axis=0)
+            img_p = np.take(img_p, indices, axis=0)
 
         # Assemble output and return
-        out = {
+        return {
             'binary': img_b,
             'photo': img_p
         }
-        gc.collect()
-        return out
 
     def assemble_train_test(self, split: float) -> 'DataFloorPhoto':
         """
@@ -258,14 +350,8 @@ class DataFloorPhoto(object):
         :return: Self
         """
         assert 0 < split < 1, 'Split must be between 0 and 1'
-        train = []
-        test = []
-        for i in range(int(split * len(self._parts))):
-            train.append(self._parts[i])
-        for i in self._parts:
-            if i not in train:
-                test.append(i)
-        self._split = [train, test]
+        t = int(split * len(self._parts))
+        self._split = [self._parts[:t], self._parts[t:]]
         return self
 
     @property
@@ -356,9 +442,6 @@ class DataFloorPhoto(object):
                 'description': description
             }
 
-        # Collect garbage
-        gc.collect()
-
     def load_session(self, filename: str) -> None:
         """
         Load session from file.
@@ -370,31 +453,36 @@ class DataFloorPhoto(object):
             filename += '.json'
         with open(filename, 'r') as fp:
             data = json.load(fp)
+        self._load_session_data(filename, data)
 
-            # Check if the version of the export is the same
-            assert data['version'] == _SESSION_EXPORT_VERSION, \
-                'Outdated session export version, needed {0}, current {1}'.format(_SESSION_EXPORT_VERSION, data['version'])
-
-            # Check object data class is the same
-            assert data['class'] == 'DataFloorPhoto', 'Data class is not valid'
-            assert data['floor_photo_ch'] == self._floor_photo_ch, 'Floor image channels changed'
-            assert data['floor_photo_size'] == self._floor_photo_size, 'Floor image size changed'
-
-            # Check parts ID are the same
-            assert len(data['parts']) == len(self._parts)
-            for i in data['parts']:
-                assert i in self._parts, f'Part ID <{i}> does not exists'
-            self._parts = data['parts']
-            self._split = data['split']
-
-            self._loaded_session = {
-                'file': filename,
-                'description': data['description']
-            }
+    def _load_session_data(self, filename: str, data: Dict[str, Any]) -> None:
+        """
+        Load session from already parsed data.
 
-        # Collect garbage
-        time.sleep(1)
-        gc.collect()
+        :param filename: Session filename
+        :param data: Parsed session data
+        """
+        # Check if the version of the export is the same
+        assert data['version'] == _SESSION_EXPORT_VERSION, \
+            'Outdated session export version, needed {0}, current {1}'.format(_SESSION_EXPORT_VERSION, data['version'])
+
+        # Check object data class is the same
+        assert data['class'] == 'DataFloorPhoto', 'Data class is not valid'
+        assert data['floor_photo_ch'] == self._floor_photo_ch, 'Floor image channels changed'
+        assert data['floor_photo_size'] == self._floor_photo_size, 'Floor image size changed'
+
+        # Check parts ID are the same
+        assert len(data['parts']) == len(self._parts)
+        parts = set(self._parts)
+        for i in data['parts']:
+            assert i in parts, f'Part ID <{i}> does not exists'
+        self._parts = data['parts']
+        self._split = data['split']
+
+        self._loaded_session = {
+            'file': filename,
+            'description': data['description']
+        }
 
     def update_session(self) -> None:
         """
@@ -434,7 +522,8 @@ def load_floor_photo_data_from_session(filename: str) -> 'DataFloorPhoto':
         'Outdated session export version, needed {0}, current {1}'.format(
             _SESSION_EXPORT_VERSION, data['version'])
 
-    data = DataFloorPhoto(path=data['path'])
-    data.load_session(filename=filename)
+    obj = DataFloorPhoto(path=data['path'])
+    # noinspection PyProtectedMember
+    obj._load_session_data(filename, data)  # Reuse the parsed file instead of loading it twice
 
-    return data
+    return obj
@@ -18,6 +18,11 @@ import json
 import os
 import tensorflow as tf
 
+try:
+    import orjson  # Optional, parses large session files several times faster
+except ImportError:
+    orjson = None
+
 
 # noinspection PyTypeChecker
 def load_model_from_session(
@@ -37,16 +42,22 @@ def load_model_from_session(
     """
     if enable_memory_growth is not None:
         assert isinstance(enable_memory_growth, bool)
-        physical_devices = tf.config.experimental.list_physical_devices('GPU')
-        tf.config.experimental.set_memory_growth(physical_devices[0], enable_memory_growth)
+        # Configure every GPU; on CPU-only hosts the list is empty and the old
+        # [0] access crashed the session load before the model was even read
+        for device in tf.config.experimental.list_physical_devices('GPU'):
+            tf.config.experimental.set_memory_growth(device, enable_memory_growth)
 
     if '.json' not in filename:
         filename += '.json'
     assert os.path.isfile(filename), f'Session file <{filename}> does not exist'
     parent_dir = Path(os.path.abspath(filename)).parent.parent
 
-    with open(filename, 'r') as fp:
-        data = json.load(fp)
+    if orjson is not None:
+        with open(filename, 'rb') as fp:
+            data = orjson.loads(fp.read())
+    else:
+        with open(filename, 'r') as fp:
+            data = json.load(fp)
     assert data['version'] == SESSION_MODEL_VERSION, \
         'Outdated session export version, needed {0}, current {1}'.format(
             SESSION_MODEL_VERSION, data['version'])
@@ -9,26 +9,41 @@ __all__ = [
     'load_history_from_csv'
 ]
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
 import hashlib
+import mmap
 import os
 
+_MD5_CACHE: Dict[str, Tuple[float, int, str]] = {}  # File path -> (mtime, size, hash)
+
 
 def file_md5(fname, buffer_size: int = 65536) -> str:
     """
-    Returns md5 of a file.
+    Returns md5 of a file. Hashes are cached and recomputed only if the
+    file modification time or size changed.
 
     :param fname: File to compute hash
     :param buffer_size: Buffer size in bytes
     :return: File hash
     """
     assert buffer_size > 0
+    st = os.stat(fname)
+    cached = _MD5_CACHE.get(fname)
+    if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+        return cached[2]
     hash_md5 = hashlib.md5()
     with open(fname, 'rb') as f:
-        for chunk in iter(lambda: f.read(buffer_size), b''):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+        try:
+            # Hash the memory-mapped file, avoiding chunked read copies
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                hash_md5.update(m)
+        except (ValueError, OSError):  # Empty file or mapping not supported
+            for chunk in iter(lambda: f.read(buffer_size), b''):
+                hash_md5.update(chunk)
+    md5 = hash_md5.hexdigest()
+    _MD5_CACHE[fname] = (st.st_mtime, st.st_size, md5)
+    return md5
 
 
 def load_history_from_csv(file_csv: str) -> Dict[str, Any]:
@@ -109,25 +109,20 @@ class UNETFloorPhotoModelPlot(GenericModelPlot):
         if n_samples == 0:
             raise ValueError(f'Part <{part}> does not have any samples to show')
 
-        # Create figure
-        plt.figure(dpi=DEFAULT_PLOT_DPI)
+        # Create figure with the full axes grid at once, instead of resolving
+        # plt.subplot geometry once per image
+        fig, axes = plt.subplots(3, n_samples, dpi=DEFAULT_PLOT_DPI, squeeze=False)
         plt.style.use(DEFAULT_PLOT_STYLE)
 
-        # plot real source images
-        for i in range(n_samples):
-            plt.subplot(3, n_samples, 1 + i)
-            plt.axis('off')
-            plt.imshow(sample['input'][i])
-        # plot generated target image
-        for i in range(n_samples):
-            plt.subplot(3, n_samples, 1 + n_samples + i)
-            plt.axis('off')
-            plt.imshow(sample['predicted'][i])
-        # plot real target image
-        for i in range(n_samples):
-            plt.subplot(3, n_samples, 1 + n_samples * 2 + i)
-            plt.axis('off')
-            plt.imshow(sample['real'][i])
+        # Plot source, generated and real target image rows. Fixed gray levels
+        # and nearest interpolation skip the per-image min/max scan and the
+        # resampling pass; legacy uint8 samples span (0, 255)
+        for j, key in enumerate(('input', 'predicted', 'real')):
+            for i in range(n_samples):
+                img = sample[key][i]
+                axes[j][i].axis('off')
+                axes[j][i].imshow(img, cmap='gray', interpolation='nearest',
+                                  vmin=0, vmax=255 if img.dtype == np.uint8 else 1)
 
         save_figure(save, **kwargs)
         plt.show()
@@ -4,11 +4,18 @@ MLSTRUCT-FP BENCHMARKS - TEST - ML
 Test data floor photo load.
 """
 
+import io
+import numpy as np
 import os
+import tempfile
 import unittest
+import zipfile
 
 from MLStructFP.db import DbLoader
 from MLStructFP_benchmarks.ml.model.core import DataFloorPhoto, load_floor_photo_data_from_session
+
+# noinspection PyProtectedMember
+from MLStructFP_benchmarks.ml.model.core._data_floor_photo import _npz_load
 from MLStructFP_benchmarks.utils import FPDatasetGenerator
 
 DB_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fp.json')
@@ -66,3 +73,69 @@ class UtilsTest(unittest.TestCase):
         for i in data._split[0]:
             tr_s += data.load_part(data._parts.index(i) + 1, ignore_split=True)['binary'].shape[0]
         self.assertEqual(tr_s, data.load_part(1)['binary'].shape[0])
+
+    def test_npz_load(self) -> None:
+        """
+        Test single-array npz load.
+        """
+        a = np.arange(24, dtype='uint8').reshape((2, 3, 4))
+        tmp = tempfile.mkdtemp()
+
+        # Uncompressed archive, read straight from the stored payload
+        f_u = os.path.join(tmp, 'u.npz')
+        np.savez(f_u, data=a)
+        self.assertTrue(np.array_equal(_npz_load(f_u), a))
+
+        # Compressed archives fall back to np.load
+        f_c = os.path.join(tmp, 'c.npz')
+        np.savez_compressed(f_c, data=a)
+        self.assertTrue(np.array_equal(_npz_load(f_c), a))
+
+        # Read into a preallocated slice, shape/dtype match
+        out = np.empty((4, 3, 4), dtype='uint8')
+        r = _npz_load(f_u, out=out[0:2])
+        self.assertTrue(np.shares_memory(r, out))
+        self.assertTrue(np.array_equal(out[0:2], a))
+        _npz_load(f_c, out=out[2:4])
+        self.assertTrue(np.array_equal(out[2:4], a))
+
+        # Mismatched dtype falls back to the cast copy into out
+        out_f = np.empty((2, 3, 4), dtype='float32')
+        self.assertTrue(np.array_equal(_npz_load(f_u, out=out_f), a))
+
+        # A payload cut short of its declared shape must not load silently
+        buf = io.BytesIO()
+        # noinspection PyTypeChecker
+        np.lib.format.write_array(buf, np.zeros((64, 64), dtype='uint8'))
+        f_t = os.path.join(tmp, 't.npz')
+        with zipfile.ZipFile(f_t, 'w', zipfile.ZIP_STORED) as z:
+            z.writestr('data.npy', buf.getvalue()[:160])  # Header kept, payload cut
+        with self.assertRaises(AssertionError):
+            _npz_load(f_t, out=np.empty((64, 64), dtype='uint8'))
+
+    def test_prefetch(self) -> None:
+        """
+        Test background part prefetch.
+        """
+        data = DataFloorPhoto(self._out, shuffle_parts=False)
+        expected = DataFloorPhoto(self._out, shuffle_parts=False).load_part(1)
+
+        # A prefetch with the same key is consumed by the next load
+        data.prefetch_part(1)
+        p = data.load_part(1)
+        self.assertIsNone(data._prefetch)
+        self.assertTrue(np.array_equal(p['binary'], expected['binary']))
+
+        # A mismatched key drops the prefetched result and reads the disk
+        data.prefetch_part(1, shuffle=True)
+        p = data.load_part(1)
+        self.assertIsNone(data._prefetch)
+        self.assertTrue(np.array_equal(p['binary'], expected['binary']))
+
+        # Prefetching the same key twice keeps the pending future
+        data.prefetch_part(2)
+        future = data._prefetch[1]
+        data.prefetch_part(2)
+        self.assertIs(data._prefetch[1], future)
+        self.assertTrue(np.array_equal(data.load_part(2)['photo'],
+                                       DataFloorPhoto(self._out, shuffle_parts=False).load_part(2)['photo']))
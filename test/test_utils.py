@@ -4,10 +4,12 @@ MLSTRUCT-FP BENCHMARKS - TEST - UTILS
 Test general utils.
 """
 
+import numpy as np
 import os
 import unittest
 
 from MLStructFP.db import DbLoader
+from MLStructFP_benchmarks.ml.utils import scale_array_to_range
 from MLStructFP_benchmarks.utils import FloorPatchGenerator, FPDatasetGenerator
 
 DB_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data', 'fp.json')
@@ -46,3 +48,26 @@ class UtilsTest(unittest.TestCase):
             self.assertTrue(os.path.isfile(f'.out/{f.id}_photo.npz'))
         for i in range(len(expected)):
             self.assertEqual(r[i], expected[i])
+
+    def test_scale_array_to_range(self) -> None:
+        """
+        Test array range scaling.
+        """
+        a = np.array([[0, 63, 128, 255]], dtype='uint8')
+
+        # uint8 arrays map through the lookup table, matching np.interp
+        s = scale_array_to_range(a, (0, 1), 'float32')
+        self.assertEqual(s.dtype, np.float32)
+        self.assertTrue(np.allclose(s, a.astype('float32') / 255))
+        self.assertTrue(np.allclose(scale_array_to_range(a, (10, 20), 'float64'),
+                                    np.interp(a, (0, 255), (10, 20))))
+
+        # Default dtype is float32
+        self.assertEqual(scale_array_to_range(np.array([0, 5, 10]), (0, 1), None).dtype, np.float32)
+
+        # Arrays already in range pass through unchanged
+        b = np.array([0.0, 0.5, 1.0])
+        self.assertIs(scale_array_to_range(b, (0, 1), None), b)
+
+        # Constant arrays collapse to the range maximum
+        self.assertTrue(np.all(scale_array_to_range(np.full((3,), 7, dtype='uint8'), (0, 1), None) == 1))